@@ -0,0 +1,93 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Optional Cython build of the genotype -> symbol decoder used by
+vcf_to_iqtree_genotype_alignment.py.
+
+Build in place (requires Cython and a C compiler):
+
+    python setup_decoder.py build_ext --inplace
+
+The script picks this module up automatically when the compiled
+extension sits next to it; otherwise it uses the numba or numpy
+decoders. Semantics mirror _decode_site_py in the main script: scan
+each tab-separated sample field up to the first ':', map the allele
+digits to REF/ALT bytes, and index the packed-key symbol tables.
+"""
+
+
+cdef inline unsigned char _allele_base(unsigned char c,
+                                       unsigned char ref_b,
+                                       unsigned char alt_b) nogil:
+    if c == 48:  # '0'
+        return ref_b
+    if c == 49:  # '1'
+        return alt_b
+    return 0
+
+
+cdef void _decode_site(const unsigned char[::1] blob,
+                       Py_ssize_t pos, Py_ssize_t end,
+                       unsigned char ref_b, unsigned char alt_b,
+                       unsigned char miss,
+                       const unsigned char[::1] phased_lut,
+                       const unsigned char[::1] unphased_lut,
+                       unsigned char[:, ::1] out,
+                       Py_ssize_t j) nogil:
+    cdef Py_ssize_t i, fe, ge, glen, n = out.shape[0]
+    cdef unsigned char b1, b2, sep, c
+    for i in range(n):
+        if pos > end:
+            out[i, j] = miss
+            continue
+        fe = pos
+        ge = -1
+        while fe < end and blob[fe] != 9:  # '\t'
+            if ge < 0 and blob[fe] == 58:  # ':'
+                ge = fe
+            fe += 1
+        if ge < 0:
+            ge = fe
+        glen = ge - pos
+        if glen == 3:
+            b1 = _allele_base(blob[pos], ref_b, alt_b)
+            b2 = _allele_base(blob[pos + 2], ref_b, alt_b)
+            sep = blob[pos + 1]
+            if sep == 124:  # '|'
+                out[i, j] = phased_lut[(<int>b1 << 8) | b2]
+            elif sep == 47:  # '/'
+                out[i, j] = unphased_lut[(<int>b1 << 8) | b2]
+            else:
+                out[i, j] = miss
+        elif glen == 1:
+            b1 = _allele_base(blob[pos], ref_b, alt_b)
+            if b1 == 65 or b1 == 67 or b1 == 71 or b1 == 84:  # ACGT
+                out[i, j] = b1
+            else:
+                out[i, j] = miss
+        else:
+            out[i, j] = miss
+        pos = fe + 1
+
+
+def decode_batch(const unsigned char[::1] blob,
+                 const long long[::1] starts,
+                 const long long[::1] ends,
+                 const unsigned char[::1] refs,
+                 const unsigned char[::1] alts,
+                 int miss,
+                 const unsigned char[::1] phased_lut,
+                 const unsigned char[::1] unphased_lut,
+                 unsigned char[:, ::1] out):
+    """Decode a batch of sites; same signature as the numba batch kernel.
+
+    blob holds the concatenated raw sample blocks, starts/ends the per-
+    site slice bounds, refs/alts the uppercased REF/ALT bytes. Fills one
+    column of `out` per site; runs without the GIL so batches can be
+    decoded on a thread pool.
+    """
+    cdef Py_ssize_t j, m = starts.shape[0]
+    cdef unsigned char miss_b = <unsigned char>miss
+    with nogil:
+        for j in range(m):
+            _decode_site(blob, starts[j], ends[j], refs[j], alts[j],
+                         miss_b, phased_lut, unphased_lut, out, j)
@@ -6,67 +6,128 @@ Convert an aligned FASTA to NEXUS (DNA).
 Usage:
   python fasta2nexus.py -i input.fasta -o output.nex
 """
-import argparse, re
+import argparse, mmap, string
 from pathlib import Path
 
-def parse_fasta(fp: Path):
+# Characters allowed in an unquoted NEXUS taxon name.
+_TAXON_ALLOWED = frozenset(string.ascii_letters + string.digits + '_.-')
+
+def _iter_fasta_mmap(mm):
+    """Scan a memory-mapped FASTA for record boundaries with bytes.find
+    instead of iterating lines in Python. Sequences are yielded as bytes
+    with line breaks stripped."""
+    size = len(mm)
+    pos = 0 if mm[:1] == b'>' else mm.find(b'\n>') + 1
+    if pos == 0 and mm[:1] != b'>':
+        return
+    while 0 <= pos < size:
+        nl = mm.find(b'\n', pos)
+        if nl == -1:
+            nl = size
+        name = mm[pos + 1:nl].decode().strip()
+        nxt = mm.find(b'\n>', nl)
+        seq_end = size if nxt == -1 else nxt
+        seq = mm[nl + 1:seq_end].translate(None, b'\r\n') if nl < size else b''
+        yield name, seq
+        pos = -1 if nxt == -1 else nxt + 1
+
+def _iter_fasta_stream(f):
+    """Line-based fallback for binary inputs that cannot be memory-
+    mapped. Sequence lines accumulate into one reusable bytearray per
+    record instead of a list of per-line string chunks."""
+    name = None
+    buf = bytearray()
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(b'>'):
+            if name is not None:
+                yield name, bytes(buf)
+            name = line[1:].strip().decode()
+            buf.clear()
+        else:
+            buf.extend(line)
+    if name is not None:
+        yield name, bytes(buf)
+
+def iter_fasta(fp: Path):
+    """Yield (name, sequence bytes) records one at a time, so a record is
+    the most the converter ever holds in memory."""
     if not fp.exists():
         raise FileNotFoundError(fp)
-    recs = []
-    name = None
-    seq_chunks = []
-    with fp.open() as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('>'):
-                if name is not None:
-                    seq = ''.join(seq_chunks)
-                    recs.append((name, seq))
-                name = line[1:].strip()
-                seq_chunks = []
-            else:
-                seq_chunks.append(line)
-        if name is not None:
-            seq = ''.join(seq_chunks)
-            recs.append((name, seq))
-    if not recs:
-        raise ValueError('No sequences found')
-    lengths = {len(s) for _, s in recs}
-    if len(lengths) != 1:
-        raise ValueError(f'Sequences not equal length: {sorted(lengths)}')
-    return recs
+    with fp.open('rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            yield from _iter_fasta_stream(f)
+        else:
+            with mm:
+                yield from _iter_fasta_mmap(mm)
 
 def quote_taxon(t):
-    if re.search(r"[^A-Za-z0-9_.-]", t):
-        t2 = t.replace("'", "''")
-        return "'" + t2 + "'"
-    return t
+    # Plain set membership beats running the regex engine per taxon;
+    # clean names (the common case) return without any allocation.
+    if _TAXON_ALLOWED.issuperset(t):
+        return t
+    return "'" + t.replace("'", "''") + "'"
+
+# Shared by the placeholder and the patched Dimensions line so both have
+# the same byte length; 10 columns cover any realistic ntax/nchar.
+_DIM_FMT = '    Dimensions ntax={:<10} nchar={:<10};\n'
 
 def write_nexus(records, outpath: Path):
-    ntax = len(records)
-    nchar = len(records[0][1])
-    lines = []
-    lines.append('#NEXUS')
-    lines.append('Begin data;')
-    lines.append(f'    Dimensions ntax={ntax} nchar={nchar};')
-    lines.append('    Format datatype=DNA missing=? gap=-;')
-    lines.append('    Matrix')
-    for name, seq in records:
-        lines.append(f'    {quote_taxon(name):<30} {seq}')
-    lines.append('    ;')
-    lines.append('End;')
-    outpath.write_text('\n'.join(lines))
+    """Stream records straight into the NEXUS file.
+
+    The Dimensions line is first written with placeholder widths and
+    patched in place via seek once ntax/nchar are known, so the whole
+    alignment is never held in memory. Returns (ntax, nchar); a partial
+    output file is removed if the input turns out to be invalid.
+    """
+    ntax = 0
+    nchar = None
+    with outpath.open('wb') as fh:
+        try:
+            fh.write(b'#NEXUS\nBegin data;\n')
+            dim_offset = fh.tell()
+            fh.write(_DIM_FMT.format('', '').encode())
+            fh.write(b'    Format datatype=DNA missing=? gap=-;\n')
+            fh.write(b'    Matrix\n')
+            for name, seq in records:
+                # Compare against the first record's length as we go; no
+                # second pass over the sequences, no set of lengths.
+                if nchar is None:
+                    nchar = len(seq)
+                elif len(seq) != nchar:
+                    raise ValueError(
+                        f'Sequences not equal length: {sorted({nchar, len(seq)})}')
+                ntax += 1
+                name_b = quote_taxon(name).encode()
+                fh.write(b'    ')
+                fh.write(name_b)
+                # Pad the name column to 30 plus the separating space,
+                # without formatting a new string per taxon.
+                fh.write(b' ' * max(31 - len(name_b), 1))
+                fh.write(seq)
+                fh.write(b'\n')
+            if not ntax:
+                raise ValueError('No sequences found')
+            fh.write(b'    ;\nEnd;')
+            fh.seek(dim_offset)
+            fh.write(_DIM_FMT.format(ntax, nchar).encode())
+        except Exception:
+            fh.close()
+            outpath.unlink(missing_ok=True)
+            raise
+    return ntax, nchar
 
 def main():
     ap = argparse.ArgumentParser(description='Convert aligned FASTA to NEXUS (DNA).')
     ap.add_argument('-i','--input', required=True, help='Input FASTA')
     ap.add_argument('-o','--output', required=True, help='Output NEXUS')
     args = ap.parse_args()
-    records = parse_fasta(Path(args.input))
-    write_nexus(records, Path(args.output))
-    print(f'Wrote {args.output} (ntax={len(records)}, nchar={len(records[0][1])})')
+    ntax, nchar = write_nexus(iter_fasta(Path(args.input)), Path(args.output))
+    print(f'Wrote {args.output} (ntax={ntax}, nchar={nchar})')
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,11 @@
+"""Build the optional Cython genotype decoder in place:
+
+    python setup_decoder.py build_ext --inplace
+"""
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="gt-decoder",
+    ext_modules=cythonize("_gt_decoder.pyx", language_level=3),
+)
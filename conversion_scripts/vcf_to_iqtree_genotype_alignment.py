@@ -31,8 +31,48 @@ python vcf_to_iqtree_genotype_alignment.py -i input.vcf -o out --phylip-only
 import sys
 import os
 import argparse
-import gzip
-from collections import defaultdict
+import io
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    # ISA-L's igzip is a drop-in gzip replacement with SIMD inflate/CRC,
+    # typically 2x faster than the stdlib decompressor.
+    from isal import igzip as _gzip
+except ImportError:
+    import gzip as _gzip
+
+try:
+    import numba
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+try:
+    # C-backed VCF parser; genotypes arrive as a numpy int array with no
+    # per-record string splitting at all.
+    from cyvcf2 import VCF as _CyVCF
+except ImportError:
+    _CyVCF = None
+
+try:
+    # Used only for --threads > 1: tabix lets worker processes fetch
+    # per-contig shards of an indexed VCF.
+    import pysam
+except ImportError:
+    pysam = None
+
+try:
+    # Compiled decoder built from _gt_decoder.pyx (see setup_decoder.py);
+    # preferred over the numba kernel when present since it has no JIT
+    # warm-up and no runtime dependency.
+    from _gt_decoder import decode_batch as _cy_decode_batch
+except ImportError:
+    _cy_decode_batch = None
+
+_READ_BUFFER_SIZE = 1 << 20
 
 PHASED_MAP = {
     "A|A":"A","C|C":"C","G|G":"G","T|T":"T",
@@ -52,11 +92,178 @@ UNPHASED_MAP = {
 
 def open_maybe_gzip(path):
     if path.endswith(".gz"):
-        return gzip.open(path, "rt")
-    return open(path, "r")
+        raw = _gzip.open(path, "rb")
+        return io.TextIOWrapper(io.BufferedReader(raw, buffer_size=_READ_BUFFER_SIZE))
+    return open(path, "r", buffering=_READ_BUFFER_SIZE)
+
+def build_genotype_luts(missing_char="?"):
+    """Build flat 65536-entry (phased, unphased) lookup tables mapping a
+    packed allele-pair key to the IQ-TREE symbol byte.
+
+    The key is (ord(a1) << 8) | ord(a2), a single branch-free index; any
+    key not covered by PHASED_MAP/UNPHASED_MAP (including 0 used for
+    missing or unsupported alleles) yields the missing character.
+    """
+    miss = ord(missing_char)
+    phased = np.full(65536, miss, dtype=np.uint8)
+    unphased = np.full(65536, miss, dtype=np.uint8)
+    for key, sym in PHASED_MAP.items():
+        phased[(ord(key[0]) << 8) | ord(key[2])] = ord(sym)
+    for key, sym in UNPHASED_MAP.items():
+        unphased[(ord(key[0]) << 8) | ord(key[2])] = ord(sym)
+    return phased, unphased
+
+_ACGT = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+_DEFAULT_LUTS = build_genotype_luts()
+
+def decode_site_column(gts, ref_b, alt_b, missing_char, luts):
+    """Vectorized genotype -> symbol decoding for one VCF site.
+
+    Requires GT to be the first FORMAT key and `ref_b`/`alt_b` as
+    uppercased ASCII byte values (normalized once per site by the
+    caller). Returns one uint8 symbol per entry of `gts`. Casting the
+    sample fields to dtype 'S4' keeps exactly the first four bytes of
+    each field: the full GT subfield for diploid calls ("0/1", "0|1",
+    "./.") plus one byte of lookahead, NUL padding for shorter haploid
+    calls. Anything that does not match those shapes decodes to missing,
+    which is also what the scalar converter does for such values.
+    """
+    phased_lut, unphased_lut = luts
+    miss = ord(missing_char)
+    n = len(gts)
+    chars = np.array(gts, dtype="S4").view(np.uint8).reshape(n, 4)
+    a1c, sep, a2c, tail = chars[:, 0], chars[:, 1], chars[:, 2], chars[:, 3]
+
+    zero, one = ord("0"), ord("1")
+    base1 = np.where(a1c == zero, ref_b, np.where(a1c == one, alt_b, 0)).astype(np.uint8)
+    base2 = np.where(a2c == zero, ref_b, np.where(a2c == one, alt_b, 0)).astype(np.uint8)
+
+    out = np.full(n, miss, dtype=np.uint8)
+    # The lookahead byte rules out multi-digit second alleles ("0/10"):
+    # a valid diploid GT subfield is followed by end-of-field or ':'.
+    gt_ends = (tail == 0) | (tail == ord(":"))
+    phased = (sep == ord("|")) & gt_ends
+    unphased = (sep == ord("/")) & gt_ends
+    key = (base1.astype(np.uint16) << 8) | base2
+    out[phased] = phased_lut[key[phased]]
+    out[unphased] = unphased_lut[key[unphased]]
+
+    # Haploid calls: either the whole field is one byte ("0", NUL-padded
+    # by the S3 cast) or GT is one byte followed by ':' and more keys.
+    haploid = ((sep == 0) & (a2c == 0)) | (sep == ord(":"))
+    hb = base1[haploid]
+    out[haploid] = np.where(np.isin(hb, _ACGT), hb, miss)
+    return out
+
+def decode_site_fixed3(block, n, ref_b, alt_b, missing_char, luts):
+    """Specialized decoder for the dominant FORMAT shape: exactly "GT"
+    with every sample field three bytes ("0/1", "0|1", "./.").
+
+    The caller pre-screens on block length (4 * n - 1); appending one
+    tab makes the block reshape into (n, 4) rows whose fourth byte must
+    be the field separator. A block that merely happens to have the
+    right length (say "0/10" next to a two-byte field) fails that check
+    and returns None so the general decoder runs instead.
+    """
+    phased_lut, unphased_lut = luts
+    chars = np.frombuffer(block + b"\t", dtype=np.uint8).reshape(n, 4)
+    if not (chars[:, 3] == 9).all():
+        return None
+    a1c, sep, a2c = chars[:, 0], chars[:, 1], chars[:, 2]
+
+    zero, one = ord("0"), ord("1")
+    base1 = np.where(a1c == zero, ref_b, np.where(a1c == one, alt_b, 0)).astype(np.uint8)
+    base2 = np.where(a2c == zero, ref_b, np.where(a2c == one, alt_b, 0)).astype(np.uint8)
+
+    key = (base1.astype(np.uint16) << 8) | base2
+    out = np.full(n, ord(missing_char), dtype=np.uint8)
+    phased = sep == ord("|")
+    unphased = sep == ord("/")
+    out[phased] = phased_lut[key[phased]]
+    out[unphased] = unphased_lut[key[unphased]]
+    return out
+
+def _decode_site_py(blob, n, ref_b, alt_b, miss, phased_lut, unphased_lut, out):
+    """Decode one site's tab-joined sample fields into symbol bytes.
+
+    Scans `blob` (uint8) field by field, extracts the leading GT subfield
+    (up to the first ':'), and maps it through the lookup tables. Written
+    so that numba can compile it unchanged; the pure-Python version only
+    serves as the no-numba reference.
+    """
+    L = blob.shape[0]
+    pos = 0
+    for i in range(n):
+        if pos > L:
+            out[i] = miss
+            continue
+        fe = pos
+        ge = -1
+        while fe < L and blob[fe] != 9:  # '\t'
+            if ge < 0 and blob[fe] == 58:  # ':'
+                ge = fe
+            fe += 1
+        if ge < 0:
+            ge = fe
+        glen = ge - pos
+        if glen == 3:
+            c = blob[pos]
+            b1 = ref_b if c == 48 else (alt_b if c == 49 else 0)
+            c = blob[pos + 2]
+            b2 = ref_b if c == 48 else (alt_b if c == 49 else 0)
+            sep = blob[pos + 1]
+            if sep == 124:  # '|'
+                out[i] = phased_lut[(b1 << 8) | b2]
+            elif sep == 47:  # '/'
+                out[i] = unphased_lut[(b1 << 8) | b2]
+            else:
+                out[i] = miss
+        elif glen == 1:
+            c = blob[pos]
+            b1 = ref_b if c == 48 else (alt_b if c == 49 else 0)
+            if b1 == 65 or b1 == 67 or b1 == 71 or b1 == 84:  # ACGT
+                out[i] = b1
+            else:
+                out[i] = miss
+        else:
+            out[i] = miss
+        pos = fe + 1
 
-def convert_gt_to_symbol(gt, ref, alt, missing_char="?"):
-    """Map a genotype string to the IQ-TREE symbol according to the table."""
+if _NUMBA_AVAILABLE:
+    _decode_site_jit = numba.njit(cache=True, nogil=True)(_decode_site_py)
+
+    def _decode_batch_py(blob, starts, ends, refs, alts, miss,
+                         phased_lut, unphased_lut, out):
+        for j in range(starts.shape[0]):
+            _decode_site_jit(blob[starts[j]:ends[j]], out.shape[0],
+                             refs[j], alts[j], miss,
+                             phased_lut, unphased_lut, out[:, j])
+
+    _decode_batch_jit = numba.njit(cache=True, nogil=True)(_decode_batch_py)
+else:
+    _decode_site_jit = None
+    _decode_batch_jit = None
+
+# Compiled batch decoder used by the threaded text reader, in order of
+# preference: Cython extension, then numba. Both release the GIL.
+_BATCH_DECODER = _cy_decode_batch if _cy_decode_batch is not None else _decode_batch_jit
+
+# Sites per decode batch handed to a worker thread; the nogil kernel
+# makes batches of this size large enough to amortize dispatch overhead.
+_BATCH_SITES = 1024
+
+def convert_gt_to_symbol(gt, ref, alt, missing_char="?", luts=None):
+    """Map a genotype string to the IQ-TREE symbol according to the table.
+
+    `ref`/`alt` must already be uppercased; callers hoist that (and any
+    other per-site normalization) out of their per-sample loops. `luts`
+    are packed-key tables from build_genotype_luts(); they default to
+    tables baked with '?' as the missing character, so pass tables built
+    for the run when a custom missing character is in use.
+    """
+    if luts is None:
+        luts = _DEFAULT_LUTS
     if gt in (".", "./.", ".|.", None):
         return missing_char
 
@@ -83,9 +290,9 @@ def convert_gt_to_symbol(gt, ref, alt, missing_char="?"):
             except ValueError:
                 return missing_char
             if ai == 0:
-                alle_bases.append(ref.upper())
+                alle_bases.append(ref)
             elif ai == 1:
-                alle_bases.append(alt.upper())
+                alle_bases.append(alt)
             else:
                 return missing_char  # multiallelic not supported by table
 
@@ -97,71 +304,162 @@ def convert_gt_to_symbol(gt, ref, alt, missing_char="?"):
         return b if b in ("A","C","G","T") else missing_char
 
     a1, a2 = alle_bases[0], alle_bases[1]
-    key = f"{a1}|{a2}" if phased else f"{a1}/{a2}"
-    return (PHASED_MAP if phased else UNPHASED_MAP).get(key, missing_char)
-
-def write_fasta(out_path, names, seqs, wrap=80):
-    with open(out_path, "w") as fh:
-        for n in names:
-            s = seqs[n]
-            fh.write(f">{n}\n")
-            if wrap and wrap > 0:
-                for i in range(0, len(s), wrap):
-                    fh.write(s[i:i+wrap] + "\n")
-            else:
-                fh.write(s + "\n")
+    key = (ord(a1) << 8) | ord(a2)
+    return chr((luts[0] if phased else luts[1])[key])
 
-def write_phylip_relaxed(out_path, names, seqs):
-    with open(out_path, "w") as fh:
-        fh.write(f"{len(names)} {len(seqs[names[0]]) if names else 0}\n")
-        for n in names:
-            fh.write(f"{n} {seqs[n]}\n")
+def decode_genotype_array(g, ref_b, alt_b, missing_char, luts):
+    """Map a cyvcf2 genotype array (n_samples, 3 = a1, a2, phased) to
+    symbol bytes. `ref_b`/`alt_b` are uppercased ASCII byte values.
+    Allele indices 0/1 become REF/ALT; -1 (missing) and indices > 1
+    decode to the missing character; -2 in the second slot marks a
+    haploid call."""
+    phased_lut, unphased_lut = luts
+    miss = ord(missing_char)
+    a1, a2, ph = g[:, 0], g[:, 1], g[:, 2]
+    b1 = np.where(a1 == 0, ref_b, np.where(a1 == 1, alt_b, 0)).astype(np.uint16)
+    b2 = np.where(a2 == 0, ref_b, np.where(a2 == 1, alt_b, 0)).astype(np.uint16)
+    key = (b1 << 8) | b2
+    out = np.where(ph != 0, phased_lut[key], unphased_lut[key])
+    haploid = a2 == -2
+    hb = b1[haploid]
+    out[haploid] = np.where(np.isin(hb, _ACGT), hb, miss)
+    return out.astype(np.uint8)
 
-def main():
-    ap = argparse.ArgumentParser(description="VCF -> IQ-TREE genotype alignment (FASTA/PHYLIP).")
-    ap.add_argument("-i", "--vcf", required=True, help="Input VCF (optionally .gz)")
-    ap.add_argument("-o", "--outprefix", required=True, help="Output prefix (writes .fasta/.phy)")
-    ap.add_argument("--missing-char", default="?", help="Character for missing/unsupported [default: ?]")
-    g = ap.add_mutually_exclusive_group()
-    g.add_argument("--fasta-only", action="store_true", help="Write only FASTA")
-    g.add_argument("--phylip-only", action="store_true", help="Write only PHYLIP (relaxed)")
-    args = ap.parse_args()
+def _grow(aln):
+    return np.concatenate([aln, np.empty_like(aln)], axis=1)
 
-    fasta_out = args.outprefix + ".fasta"
-    phy_out   = args.outprefix + ".phy"
+def _read_vcf_cyvcf2(path, missing, luts):
+    """Read with cyvcf2/htslib. Raises on records htslib rejects; the
+    caller falls back to the tolerant text parser in that case."""
+    vcf = _CyVCF(path, gts012=False)
+    sample_names = list(vcf.samples)
+    aln = np.empty((len(sample_names), 1024), dtype=np.uint8)
+    col = 0
+    kept_sites = 0
+    for rec in vcf:
+        alts = rec.ALT
+        # Keep only biallelic SNPs
+        if len(alts) != 1 or len(rec.REF) != 1 or len(alts[0]) != 1:
+            continue
+        kept_sites += 1
+        try:
+            g = rec.genotype.array()
+        except Exception:
+            g = None  # record has no GT field
+        if g is None:
+            site = np.full(len(sample_names), ord(missing), dtype=np.uint8)
+        else:
+            if g.shape[1] != 3:
+                raise ValueError("ploidy > 2 is not supported")
+            site = decode_genotype_array(g, ord(rec.REF.upper()),
+                                         ord(alts[0].upper()), missing, luts)
+        if col == aln.shape[1]:
+            aln = _grow(aln)
+        aln[:, col] = site
+        col += 1
+    return sample_names, aln[:, :col], kept_sites
 
-    with open_maybe_gzip(args.vcf) as f:
-        sample_names = []
-        seq_lists = defaultdict(list)
-        total_variants = 0
-        kept_sites = 0
+def _read_vcf_text(path, missing, luts):
+    """Read with the hand-rolled splitter; malformed genotype fields
+    decode to the missing character instead of failing the run.
 
+    With the numba kernel available, kept GT-first sites are batched and
+    decoded on a thread pool (the kernel releases the GIL); an ordered
+    queue of pending batches keeps columns in input order.
+    """
+    with open_maybe_gzip(path) as f:
+        sample_names = None
         for line in f:
-            if not line.strip():
-                continue
-            if line.startswith("##"):
-                continue
             if line.startswith("#CHROM"):
-                parts = line.rstrip("\n").split("\t")
-                sample_names = parts[9:]
-                for s in sample_names:
-                    seq_lists[s] = []
-                continue
+                sample_names = line.rstrip("\n").split("\t")[9:]
+                break
+        if sample_names is None:
+            return [], np.empty((0, 0), dtype=np.uint8), 0
+        aln, kept_sites = _decode_lines(f, sample_names, missing, luts)
+    return sample_names, aln, kept_sites
 
-            total_variants += 1
-            parts = line.rstrip("\n").split("\t")
-            if len(parts) < 10:
+def _decode_lines(lines, sample_names, missing, luts, jobs=None):
+    """Decode an iterable of VCF data lines into a (n_samples, n_sites)
+    uint8 block; returns (block, kept_sites). `jobs` caps the decode
+    thread pool (shard workers pass 1 to avoid oversubscription)."""
+    # Alignment matrix, one row per sample and one byte per cell,
+    # grown geometrically and trimmed once the site count is known.
+    aln = np.empty((len(sample_names), 1024), dtype=np.uint8)
+    col = 0
+    kept_sites = 0
+
+    workers = jobs or os.cpu_count() or 1
+    pool = ThreadPoolExecutor(max_workers=workers) if _BATCH_DECODER is not None else None
+    max_pending = 2 * workers
+    segments = deque()  # (future or None, (n_samples, m) uint8 block)
+
+    batch_blob = bytearray()
+    batch_starts, batch_ends = [], []
+    batch_refs, batch_alts = [], []
+
+    def flush_batch():
+        if not batch_starts:
+            return
+        blob = np.frombuffer(bytes(batch_blob), dtype=np.uint8)
+        starts = np.array(batch_starts, dtype=np.int64)
+        ends = np.array(batch_ends, dtype=np.int64)
+        refs = np.array(batch_refs, dtype=np.uint8)
+        alts = np.array(batch_alts, dtype=np.uint8)
+        out = np.empty((len(sample_names), starts.shape[0]), dtype=np.uint8)
+        fut = pool.submit(_BATCH_DECODER, blob, starts, ends, refs, alts,
+                          ord(missing), luts[0], luts[1], out)
+        segments.append((fut, out))
+        batch_blob.clear()
+        del batch_starts[:], batch_ends[:], batch_refs[:], batch_alts[:]
+
+    def write_block(fut, block):
+        nonlocal aln, col
+        if fut is not None:
+            fut.result()
+        m = block.shape[1]
+        while col + m > aln.shape[1]:
+            aln = _grow(aln)
+        aln[:, col:col + m] = block
+        col += m
+
+    try:
+        for line in lines:
+            if not line.strip() or line.startswith("#"):
                 continue
 
-            chrom, pos, vid, ref, alt = parts[0], parts[1], parts[2], parts[3], parts[4]
-            fmt = parts[8]
-            gts = parts[9:]
+            # Keep only biallelic SNPs, decided from the tab positions
+            # alone: REF sits between tabs 3 and 4, ALT between tabs 4
+            # and 5. Rejected lines (indels, multiallelics -- often the
+            # majority) never get split at all.
+            t3 = -1
+            for _ in range(3):
+                t3 = line.find("\t", t3 + 1)
+                if t3 == -1:
+                    break
+            if t3 == -1:
+                continue
+            t4 = line.find("\t", t3 + 1)
+            if t4 == -1 or t4 - t3 != 2:
+                continue  # REF missing or longer than one base
+            t5 = line.find("\t", t4 + 1)
+            if t5 == -1 or t5 - t4 != 2:
+                continue  # ALT missing, multiallelic, or an indel
+            ref = line[t3 + 1]
+            alt = line[t4 + 1]
 
-            # Keep only biallelic SNPs
-            if "," in alt:
+            # FORMAT sits between tabs 8 and 9; everything after tab 9
+            # is the sample block.
+            t8 = t5
+            for _ in range(3):
+                t8 = line.find("\t", t8 + 1)
+                if t8 == -1:
+                    break
+            if t8 == -1:
                 continue
-            if len(ref) != 1 or len(alt) != 1:
+            t9 = line.find("\t", t8 + 1)
+            if t9 == -1:
                 continue
+            fmt = line[t8 + 1:t9]
 
             fmt_keys = fmt.split(":")
             try:
@@ -170,26 +468,209 @@ def main():
                 gt_idx = None
 
             kept_sites += 1
-            for si, s in enumerate(sample_names):
-                if gt_idx is None or si >= len(gts):
-                    sym = args.missing_char
+            n = len(sample_names)
+            sample_block = line[t9 + 1:].rstrip("\n")
+
+            # Normalize REF/ALT once per site; every decoder below works
+            # on the uppercased characters.
+            ref_u = ref.upper()
+            alt_u = alt.upper()
+            ref_b = ord(ref_u)
+            alt_b = ord(alt_u)
+
+            if gt_idx == 0 and pool is not None:
+                # Hot path: the raw sample block goes straight into
+                # the batch blob; the kernel finds field boundaries
+                # itself, so the block is never split in Python.
+                start = len(batch_blob)
+                batch_blob += sample_block.encode("ascii")
+                batch_starts.append(start)
+                batch_ends.append(len(batch_blob))
+                batch_refs.append(ref_b)
+                batch_alts.append(alt_b)
+                if len(batch_starts) >= _BATCH_SITES:
+                    flush_batch()
+                    while len(segments) > max_pending:
+                        write_block(*segments.popleft())
+                continue
+
+            site = None
+            if fmt == "GT" and n and len(sample_block) == 4 * n - 1:
+                # Fixed-width fast path: uniform 3-byte GT-only fields
+                # decode from one frombuffer + reshape, with no split.
+                site = decode_site_fixed3(sample_block.encode("ascii"), n,
+                                          ref_b, alt_b, missing, luts)
+            if site is None:
+                gts = sample_block.split("\t")
+                if gt_idx == 0 and len(gts) >= n:
+                    # GT first in FORMAT: decode the whole column with
+                    # numpy instead of per-sample dict lookups.
+                    site = decode_site_column(gts[:n], ref_b, alt_b, missing, luts)
                 else:
-                    fields = gts[si].split(":")
-                    gt_field = fields[gt_idx] if gt_idx < len(fields) else "."
-                    sym = convert_gt_to_symbol(gt_field, ref, alt, missing_char=args.missing_char)
-                seq_lists[s].append(sym)
+                    # Accumulate symbol bytes directly; bytearray.append
+                    # is a C-level realloc, not a list of 1-char strings.
+                    syms = bytearray()
+                    for si in range(n):
+                        if gt_idx is None or si >= len(gts):
+                            sym = missing
+                        else:
+                            fields = gts[si].split(":")
+                            gt_field = fields[gt_idx] if gt_idx < len(fields) else "."
+                            sym = convert_gt_to_symbol(gt_field, ref_u, alt_u,
+                                                       missing_char=missing, luts=luts)
+                        syms.append(ord(sym))
+                    site = np.frombuffer(bytes(syms), dtype=np.uint8)
+
+            if pool is not None:
+                # Single out-of-batch column: flush what came before it
+                # so the ordered queue preserves site order.
+                flush_batch()
+                segments.append((None, site[:, None]))
+            else:
+                if col == aln.shape[1]:
+                    aln = _grow(aln)
+                aln[:, col] = site
+                col += 1
+
+        if pool is not None:
+            flush_batch()
+            while segments:
+                write_block(*segments.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    return aln[:, :col], kept_sites
+
+def _tabix_samples(tbx):
+    for line in tbx.header:
+        if line.startswith("#CHROM"):
+            return line.rstrip("\n").split("\t")[9:]
+    return None
+
+def _shard_worker(job):
+    """Decode one contig of a tabix-indexed VCF (runs in a worker
+    process); jobs=1 keeps each worker single-threaded."""
+    path, contig, missing = job
+    luts = build_genotype_luts(missing)
+    with pysam.TabixFile(path) as tbx:
+        sample_names = _tabix_samples(tbx)
+        return _decode_lines(tbx.fetch(contig), sample_names, missing,
+                             luts, jobs=1)
+
+def _read_vcf_sharded(path, missing, threads):
+    """Decode contigs in parallel worker processes and concatenate the
+    per-contig blocks in contig order. Requires a tabix index; raises
+    OSError/ValueError when the input is not indexed or not bgzipped."""
+    with pysam.TabixFile(path) as tbx:
+        contigs = list(tbx.contigs)
+        sample_names = _tabix_samples(tbx)
+    if sample_names is None:
+        raise ValueError("no #CHROM header line")
+    import multiprocessing
+    with multiprocessing.Pool(threads) as p:
+        results = p.map(_shard_worker, [(path, c, missing) for c in contigs])
+    if results:
+        aln = np.concatenate([blk for blk, _ in results], axis=1)
+        kept_sites = sum(kept for _, kept in results)
+    else:
+        aln = np.empty((len(sample_names), 0), dtype=np.uint8)
+        kept_sites = 0
+    return sample_names, aln, kept_sites
+
+# Stay under the kernel's IOV_MAX (1024 on Linux) per writev call.
+_MAX_IOV = 1000
+
+def _writev_all(fd, bufs):
+    """os.writev the whole buffer list, resuming after short writes."""
+    while bufs:
+        written = os.writev(fd, bufs)
+        i = 0
+        while i < len(bufs) and written >= len(bufs[i]):
+            written -= len(bufs[i])
+            i += 1
+        if i == len(bufs):
+            return
+        bufs = bufs[i:]
+        if written:
+            bufs[0] = memoryview(bufs[0])[written:]
+
+def write_fasta(out_path, names, aln, wrap=80):
+    """Write the (n_samples, n_sites) uint8 symbol matrix as FASTA.
+
+    Headers and matrix-row slices are gathered into iovec lists and sent
+    with os.writev, so sequence bytes travel from the matrix to the
+    kernel without being copied into an intermediate buffer first. A
+    single-buffer fallback covers platforms without writev.
+    """
+    if not hasattr(os, "writev"):
+        return _write_fasta_buffered(out_path, names, aln, wrap)
+    # Row views are handed to writev directly, which needs contiguous
+    # memory; a no-op when the matrix was trimmed to its full width.
+    aln = np.ascontiguousarray(aln)
+    nl = b"\n"
+    fd = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        bufs = []
+        for i, name in enumerate(names):
+            bufs.append(b">" + name.encode() + nl)
+            row = aln[i]
+            if wrap and wrap > 0:
+                for k in range(0, row.shape[0], wrap):
+                    bufs.append(row[k:k + wrap])
+                    bufs.append(nl)
+                    if len(bufs) >= _MAX_IOV:
+                        _writev_all(fd, bufs)
+                        bufs = []
+            else:
+                bufs.append(row)
+                bufs.append(nl)
+            if len(bufs) >= _MAX_IOV:
+                _writev_all(fd, bufs)
+                bufs = []
+        _writev_all(fd, bufs)
+    finally:
+        os.close(fd)
+
+def _write_fasta_buffered(out_path, names, aln, wrap=80):
+    """Single-buffer FASTA writer used where os.writev is unavailable."""
+    buf = bytearray()
+    for i, name in enumerate(names):
+        buf += b">"
+        buf += name.encode()
+        buf += b"\n"
+        row = aln[i]
+        if wrap and wrap > 0:
+            for k in range(0, row.shape[0], wrap):
+                buf += row[k:k + wrap].tobytes()
+                buf += b"\n"
+        else:
+            buf += row.tobytes()
+            buf += b"\n"
+    with open(out_path, "wb") as fh:
+        fh.write(buf)
 
-    # Build sequences
-    seqs = {s: "".join(seq_lists[s]) for s in sample_names}
+def write_phylip_relaxed(out_path, names, aln):
+    """Write relaxed PHYLIP straight from the uint8 matrix through a
+    1 MiB buffered binary stream. Name, separator and sequence bytes go
+    out as separate pieces, so no per-sample formatted string ever
+    clones the row."""
+    with open(out_path, "wb", buffering=1 << 20) as fh:
+        fh.write(f"{len(names)} {aln.shape[1] if names else 0}\n".encode())
+        for i, name in enumerate(names):
+            fh.write(name.encode())
+            fh.write(b" ")
+            fh.write(aln[i].tobytes())
+            fh.write(b"\n")
 
-    # Write outputs
+def _write_outputs(args, sample_names, aln, kept_sites, fasta_out, phy_out):
     if not args.phylip_only:
-        write_fasta(fasta_out, sample_names, seqs)
+        write_fasta(fasta_out, sample_names, aln)
     if not args.fasta_only:
-        write_phylip_relaxed(phy_out, sample_names, seqs)
+        write_phylip_relaxed(phy_out, sample_names, aln)
 
     # Summary
-    aln_len = len(seqs[sample_names[0]]) if sample_names else 0
+    aln_len = aln.shape[1] if sample_names else 0
     sys.stderr.write(
         f"[vcf_to_iqtree] Samples: {len(sample_names)} | Sites kept: {kept_sites} | "
         f"Alignment length: {aln_len}\n"
@@ -198,5 +679,58 @@ def main():
         f"{phy_out if not args.fasta_only else '(PHYLIP skipped)'}\n"
     )
 
+def main():
+    ap = argparse.ArgumentParser(description="VCF -> IQ-TREE genotype alignment (FASTA/PHYLIP).")
+    ap.add_argument("-i", "--vcf", required=True, help="Input VCF (optionally .gz)")
+    ap.add_argument("-o", "--outprefix", required=True, help="Output prefix (writes .fasta/.phy)")
+    ap.add_argument("--missing-char", default="?", help="Character for missing/unsupported [default: ?]")
+    ap.add_argument("--threads", type=int, default=1,
+                    help="Decode contigs in N worker processes "
+                         "(needs pysam and a tabix-indexed .vcf.gz) [default: 1]")
+    g = ap.add_mutually_exclusive_group()
+    g.add_argument("--fasta-only", action="store_true", help="Write only FASTA")
+    g.add_argument("--phylip-only", action="store_true", help="Write only PHYLIP (relaxed)")
+    args = ap.parse_args()
+
+    fasta_out = args.outprefix + ".fasta"
+    phy_out   = args.outprefix + ".phy"
+
+    missing = args.missing_char
+    if len(missing) != 1 or not missing.isascii():
+        ap.error("--missing-char must be a single ASCII character")
+    luts = build_genotype_luts(missing)
+
+    if args.threads > 1:
+        if pysam is None:
+            sys.stderr.write("[vcf_to_iqtree] --threads needs pysam; "
+                             "using the single-process reader\n")
+        else:
+            try:
+                sample_names, aln, kept_sites = _read_vcf_sharded(
+                    args.vcf, missing, args.threads)
+            except (OSError, ValueError) as e:
+                sys.stderr.write(f"[vcf_to_iqtree] contig sharding unavailable "
+                                 f"({e}); using the single-process reader\n")
+            else:
+                _write_outputs(args, sample_names, aln, kept_sites,
+                               fasta_out, phy_out)
+                return
+
+    if _CyVCF is not None:
+        try:
+            sample_names, aln, kept_sites = _read_vcf_cyvcf2(args.vcf, missing, luts)
+        except Exception as e:
+            # htslib raises on malformed records the text parser tolerates
+            # (it maps them to missing); cyvcf2 surfaces them as a bare
+            # Exception, so reparse the file with the tolerant path.
+            sys.stderr.write(
+                f"[vcf_to_iqtree] cyvcf2 parse failed ({e}); "
+                f"falling back to the text parser\n")
+            sample_names, aln, kept_sites = _read_vcf_text(args.vcf, missing, luts)
+    else:
+        sample_names, aln, kept_sites = _read_vcf_text(args.vcf, missing, luts)
+
+    _write_outputs(args, sample_names, aln, kept_sites, fasta_out, phy_out)
+
 if __name__ == "__main__":
     main()